@@ -0,0 +1,16 @@
+"""Gunicorn configuration for multi-worker production deployment.
+
+Run from the backend/ directory with:
+
+    gunicorn -c gunicorn_conf.py main:app
+
+NOTE: `payments` and `idempotency_cache` are per-process dicts, so with
+more than one worker each process sees only its own payments. Move state
+to a shared store (e.g. Redis) before scaling workers above 1.
+"""
+import multiprocessing
+
+bind = "0.0.0.0:8000"
+workers = 2 * multiprocessing.cpu_count()
+worker_class = "uvicorn.workers.UvicornWorker"
+loglevel = "warning"
@@ -1,43 +1,127 @@
 """FastAPI Payment API"""
 import asyncio
+import logging
+import os
 from datetime import datetime
-from fastapi import FastAPI, HTTPException, Header
+from fastapi import FastAPI, HTTPException, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, Optional
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from typing import Optional
 import uvicorn
 
 from models import (
+    UTC,
     Payment,
     PaymentRequest,
     PaymentResponse,
     PaymentStatus,
     WebhookPayload
 )
+from storage import create_store
 
-app = FastAPI(title="Banco Azul Payment API", version="1.0.0")
+API_TITLE = "Banco Azul Payment API"
+API_VERSION = "1.0.0"
 
-# CORS for frontend
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+# Hoisted constants: built once at import instead of per request
+PAY_PORTAL_BASE = "https://banco-azul.example.com/pay/"
+PAYMENT_NOT_FOUND = "Payment not found"
+
+# orjson serializes responses in C (native datetime/UUID/enum support)
+app = FastAPI(
+    title=API_TITLE,
+    version=API_VERSION,
+    default_response_class=ORJSONResponse,
 )
 
-# In-memory storage (use database in production)
-payments: Dict[str, Payment] = {}
-idempotency_cache: Dict[str, str] = {}  # idempotency_key -> payment_id
+# CORS for frontend; set API_ONLY=1 to skip the middleware (and its
+# per-request header pass) on deployments that never serve a browser
+if os.getenv("API_ONLY") != "1":
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+# Compress larger JSON bodies (full payment payloads) for clients that send
+# Accept-Encoding: gzip; minimum_size leaves the small health/webhook acks
+# alone, and compresslevel=1 trades a few % of ratio for ~3x encoder speed
+app.add_middleware(GZipMiddleware, minimum_size=500, compresslevel=1)
+
+# Storage backend: in-memory dicts by default, Redis when REDIS_URL is set
+# (required for multi-worker deployments, see gunicorn_conf.py)
+store = create_store()
+
+logger = logging.getLogger("payments")
+
+# Webhook side-effects (audit logging, downstream notifications) run off the
+# request path: receive_webhook enqueues an event and returns immediately
+webhook_events: "asyncio.Queue[dict]" = asyncio.Queue()
+
+
+async def process_webhook_events():
+    """Background consumer for events queued by receive_webhook.
+
+    Pending events are drained as a batch and coalesced by payment_id,
+    keeping only the newest per payment, so a burst of provider retries
+    triggers one side-effect pass instead of one per delivery.
+    """
+    while True:
+        event = await webhook_events.get()
+        batch = {event["payment_id"]: event}
+        webhook_events.task_done()
+
+        while not webhook_events.empty():
+            event = webhook_events.get_nowait()
+            newest = batch.get(event["payment_id"])
+            if newest is None or event["ts"] >= newest["ts"]:
+                batch[event["payment_id"]] = event
+            webhook_events.task_done()
+
+        for event in batch.values():
+            logger.info(
+                "webhook applied: payment=%s status=%s",
+                event["payment_id"],
+                event["status"],
+            )
+
+
+@app.on_event("startup")
+async def start_webhook_worker():
+    app.state.webhook_worker = asyncio.create_task(process_webhook_events())
+
+
+def to_epoch_ns(value: datetime) -> int:
+    """Convert an aware datetime to epoch nanoseconds"""
+    return int(value.timestamp() * 1_000_000_000)
+
+
+def parse_webhook_timestamp(value: str) -> datetime:
+    """Parse a provider ISO-8601 timestamp into aware UTC.
+
+    fromisoformat accepts the trailing 'Z' natively on Python 3.11+, so no
+    string mangling is needed. Naive inputs are treated as UTC to match the
+    aware timestamps stored on Payment.
+    """
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=UTC)
+    return parsed.astimezone(UTC)
 
 
 @app.get("/")
 async def root():
-    return {"message": "Banco Azul Payment API", "version": "1.0.0"}
+    return {"message": API_TITLE, "version": API_VERSION}
 
 
-@app.post("/payments", response_model=PaymentResponse, status_code=201)
+# No response_model: the PaymentResponse is validated at construction and
+# re-validating it on the way out costs a second full Pydantic pass
+@app.post("/payments", status_code=201)
 async def create_payment(
     request: PaymentRequest,
+    response: Response,
     idempotency_key: Optional[str] = Header(None)
 ):
     """Create a new payment"""
@@ -45,19 +129,6 @@ async def create_payment(
     # Use header idempotency key if provided, otherwise from body
     key = idempotency_key or request.idempotency_key
 
-    # Check idempotency
-    if key in idempotency_cache:
-        existing_payment_id = idempotency_cache[key]
-        existing_payment = payments[existing_payment_id]
-        return PaymentResponse(
-            payment_id=existing_payment.payment_id,
-            status=existing_payment.status,
-            redirect_url=f"https://banco-azul.example.com/pay/{existing_payment.payment_id}",
-            amount=existing_payment.amount,
-            currency=existing_payment.currency,
-            created_at=existing_payment.created_at
-        )
-
     # Create new payment
     payment = Payment(
         amount=request.amount,
@@ -69,12 +140,25 @@ async def create_payment(
         idempotency_key=key
     )
 
+    # Atomic idempotency claim: retries get the original payment back
+    existing_payment_id = await store.claim_idempotency_key(key, payment.payment_id)
+    if existing_payment_id is not None:
+        existing_payment = await store.get_payment(existing_payment_id)
+        response.status_code = 200  # Replayed, not created
+        return PaymentResponse(
+            payment_id=existing_payment.payment_id,
+            status=existing_payment.status,
+            redirect_url=PAY_PORTAL_BASE + existing_payment.payment_id,
+            amount=existing_payment.amount,
+            currency=existing_payment.currency,
+            created_at=existing_payment.created_at
+        )
+
     # Store payment
-    payments[payment.payment_id] = payment
-    idempotency_cache[key] = payment.payment_id
+    await store.save_payment(payment)
 
     # Generate redirect URL (mock bank portal)
-    redirect_url = f"https://banco-azul.example.com/pay/{payment.payment_id}"
+    redirect_url = PAY_PORTAL_BASE + payment.payment_id
 
     return PaymentResponse(
         payment_id=payment.payment_id,
@@ -86,13 +170,15 @@ async def create_payment(
     )
 
 
-@app.get("/payments/{payment_id}", response_model=Payment)
+@app.get("/payments/{payment_id}")
 async def get_payment(payment_id: str):
     """Get payment status"""
-    if payment_id not in payments:
-        raise HTTPException(status_code=404, detail="Payment not found")
+    payment = await store.get_payment(payment_id)
+    if payment is None:
+        raise HTTPException(status_code=404, detail=PAYMENT_NOT_FOUND)
 
-    return payments[payment_id]
+    # Already validated at construction; skip the response_model re-validation
+    return ORJSONResponse(payment.model_dump(mode="json"))
 
 
 @app.post("/webhooks")
@@ -101,33 +187,48 @@ async def receive_webhook(webhook: WebhookPayload):
 
     payment_id = webhook.payment_id
 
-    if payment_id not in payments:
-        raise HTTPException(status_code=404, detail="Payment not found")
-
-    payment = payments[payment_id]
-
-    # Idempotency: Check if this exact webhook was already processed
-    # In production, store webhook IDs or use timestamp + signature
-    if payment.status == webhook.status and payment.webhook_count > 0:
-        # Already processed this status update
-        return {"message": "Webhook already processed", "idempotent": True}
-
-    # Timestamp-based ordering: newer webhooks win
-    webhook_time = datetime.fromisoformat(webhook.timestamp.replace('Z', '+00:00'))
-
-    if webhook_time < payment.updated_at:
-        # This is an older webhook, ignore it
-        return {
-            "message": "Webhook ignored (older than current state)",
-            "out_of_order": True
-        }
-
-    # Update payment status
-    payment.status = webhook.status
-    payment.updated_at = webhook_time
-    payment.webhook_count += 1
-
-    payments[payment_id] = payment
+    # Serialize the read-modify-write per shard: the store can suspend
+    # between the read and the final write (Redis backend), letting two
+    # concurrent webhooks both pass the ordering check and the later —
+    # possibly older-timestamped — one win the write
+    async with store.lock_for(payment_id):
+        payment = await store.get_payment(payment_id)
+        if payment is None:
+            raise HTTPException(status_code=404, detail=PAYMENT_NOT_FOUND)
+
+        # Idempotency: Check if this exact webhook was already processed
+        # In production, store webhook IDs or use timestamp + signature
+        if payment.status == webhook.status and payment.webhook_count > 0:
+            # Already processed this status update
+            return {"message": "Webhook already processed", "idempotent": True}
+
+        # Timestamp-based ordering: newer webhooks win. Compare plain
+        # epoch-ns ints rather than datetime objects
+        webhook_time = parse_webhook_timestamp(webhook.timestamp)
+        webhook_ts = to_epoch_ns(webhook_time)
+
+        if webhook_ts < payment.updated_at_ts:
+            # This is an older webhook, ignore it
+            return {
+                "message": "Webhook ignored (older than current state)",
+                "out_of_order": True
+            }
+
+        # Update payment status
+        payment.status = webhook.status
+        payment.updated_at = webhook_time
+        payment.updated_at_ts = webhook_ts
+        payment.webhook_count += 1
+        payment.reason = webhook.reason
+
+        await store.save_payment_update(payment)
+
+    # Side-effects happen in the background worker, not on this request
+    webhook_events.put_nowait({
+        "payment_id": payment_id,
+        "status": payment.status,
+        "ts": webhook_ts,
+    })
 
     return {
         "message": "Webhook processed",
@@ -139,29 +240,33 @@ async def receive_webhook(webhook: WebhookPayload):
 @app.delete("/payments/{payment_id}")
 async def delete_payment(payment_id: str):
     """Delete payment (for test cleanup)"""
-    if payment_id in payments:
-        payment = payments.pop(payment_id)
-        # Remove from idempotency cache
-        if payment.idempotency_key in idempotency_cache:
-            idempotency_cache.pop(payment.idempotency_key)
+    if await store.delete_payment(payment_id):
         return {"message": "Payment deleted"}
 
-    raise HTTPException(status_code=404, detail="Payment not found")
+    raise HTTPException(status_code=404, detail=PAYMENT_NOT_FOUND)
 
 
 @app.delete("/payments")
 async def delete_all_payments():
     """Delete all payments (for test cleanup)"""
-    payments.clear()
-    idempotency_cache.clear()
+    await store.clear()
     return {"message": "All payments deleted"}
 
 
 @app.get("/health")
 async def health():
     """Health check endpoint"""
-    return {"status": "healthy", "payments_count": len(payments)}
+    return {"status": "healthy", "payments_count": await store.count()}
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # uvloop (Cython libuv loop) + httptools (C HTTP parser) cut per-request
+    # overhead vs the default asyncio loop and pure-Python h11 parser
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        log_level="warning",
+    )
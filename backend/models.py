@@ -1,9 +1,17 @@
 """Payment models and data structures"""
-from datetime import datetime
+import secrets
+import time
+from datetime import datetime, timezone
 from enum import Enum
 from typing import Optional
-from pydantic import BaseModel, Field
-import uuid
+from pydantic import BaseModel, ConfigDict, Field
+
+UTC = timezone.utc  # cached tz instance shared by all timestamps
+
+
+def utc_now() -> datetime:
+    """Timezone-aware UTC now (datetime.utcnow is deprecated and naive)"""
+    return datetime.now(UTC)
 
 
 class PaymentStatus(str, Enum):
@@ -38,12 +46,14 @@ class PaymentRequest(BaseModel):
     bank: Optional[str] = None
     customer: CustomerData
     redirect_url: str
-    idempotency_key: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    idempotency_key: str = Field(default_factory=lambda: secrets.token_hex(16))
 
 
 class Payment(BaseModel):
     """Payment entity"""
-    payment_id: str = Field(default_factory=lambda: f"pay_{uuid.uuid4().hex[:16]}")
+    # token_hex(8) gives the same 16 hex chars as uuid4().hex[:16] without
+    # building and discarding a full UUID object first
+    payment_id: str = Field(default_factory=lambda: f"pay_{secrets.token_hex(8)}")
     status: PaymentStatus = PaymentStatus.PENDING
     amount: str
     currency: str
@@ -52,12 +62,15 @@ class Payment(BaseModel):
     customer: CustomerData
     redirect_url: str
     idempotency_key: str
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=utc_now)
+    updated_at: datetime = Field(default_factory=utc_now)
+    # Epoch nanoseconds of the last update; webhook ordering compares these
+    # plain ints instead of datetime objects
+    updated_at_ts: int = Field(default_factory=time.time_ns)
     webhook_count: int = 0  # Track duplicate webhooks
+    reason: Optional[str] = None  # Decline/failure reason from webhook
 
-    class Config:
-        use_enum_values = True
+    model_config = ConfigDict(use_enum_values=True)
 
 
 class WebhookPayload(BaseModel):
@@ -0,0 +1,154 @@
+"""Payment storage backends"""
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from models import Payment
+
+IDEMPOTENCY_TTL = 86400  # seconds a claimed idempotency key stays reserved
+SHARD_COUNT = 16  # dict shards in the in-memory store
+IDEMPOTENCY_SHARD_LIMIT = 1024  # LRU bound per shard (~16k claims total)
+
+
+class InMemoryPaymentStore:
+    """Single-process sharded dict storage (default; fine for dev and tests)"""
+
+    def __init__(self):
+        # Keys are spread across fixed shards by hash so no single dict
+        # grows unbounded; the shard count mirrors how keys would be
+        # consistent-hashed across Redis nodes when REDIS_URL takes over
+        self._payment_shards: List[Dict[str, Payment]] = [
+            {} for _ in range(SHARD_COUNT)
+        ]
+        # Idempotency claims are LRU-bounded: the Redis backend expires
+        # them via TTL, the dict shards by evicting the oldest claim
+        self._idempotency_shards: List["OrderedDict[str, str]"] = [
+            OrderedDict() for _ in range(SHARD_COUNT)
+        ]
+        self._payment_locks = [asyncio.Lock() for _ in range(SHARD_COUNT)]
+
+    def lock_for(self, payment_id: str) -> asyncio.Lock:
+        """Shard lock serializing read-modify-write sequences on a payment"""
+        return self._payment_locks[hash(payment_id) % SHARD_COUNT]
+
+    def _payments(self, payment_id: str) -> Dict[str, Payment]:
+        return self._payment_shards[hash(payment_id) % SHARD_COUNT]
+
+    def _idempotency_cache(self, key: str) -> "OrderedDict[str, str]":
+        return self._idempotency_shards[hash(key) % SHARD_COUNT]
+
+    async def get_payment(self, payment_id: str) -> Optional[Payment]:
+        return self._payments(payment_id).get(payment_id)
+
+    async def save_payment(self, payment: Payment) -> None:
+        self._payments(payment.payment_id)[payment.payment_id] = payment
+
+    async def save_payment_update(self, payment: Payment) -> None:
+        """Persist changes to an already-stored payment.
+
+        The shard holds the same object the caller mutated, so the update
+        is already visible; re-inserting it would be a wasted dict write.
+        """
+
+    async def claim_idempotency_key(self, key: str, payment_id: str) -> Optional[str]:
+        """Reserve key for payment_id; return the existing payment_id if taken"""
+        cache = self._idempotency_cache(key)
+        # setdefault does the lookup and the insert in a single hash probe
+        winner = cache.setdefault(key, payment_id)
+        if winner != payment_id:
+            cache.move_to_end(key)  # replay hit: refresh recency
+            return winner
+        if len(cache) > IDEMPOTENCY_SHARD_LIMIT:
+            cache.popitem(last=False)  # evict the least-recently-used claim
+        return None
+
+    async def delete_payment(self, payment_id: str) -> bool:
+        # pop(key, None) removes in one probe; payment.idempotency_key is
+        # the reverse index back to the claim, so no scan is needed
+        payment = self._payments(payment_id).pop(payment_id, None)
+        if payment is None:
+            return False
+        self._idempotency_cache(payment.idempotency_key).pop(
+            payment.idempotency_key, None
+        )
+        return True
+
+    async def clear(self) -> None:
+        for shard in self._payment_shards:
+            shard.clear()
+        for shard in self._idempotency_shards:
+            shard.clear()
+
+    async def count(self) -> int:
+        return sum(len(shard) for shard in self._payment_shards)
+
+
+class RedisPaymentStore:
+    """Redis-backed storage shared across workers (enabled via REDIS_URL)"""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url, decode_responses=True)
+        self._payment_locks = [asyncio.Lock() for _ in range(SHARD_COUNT)]
+
+    def lock_for(self, payment_id: str) -> asyncio.Lock:
+        """Shard lock serializing read-modify-write sequences on a payment.
+
+        Unlike the dict store, GET/SET here suspend at each await, so
+        without the lock two concurrent webhooks for the same payment can
+        both pass the ordering check and the later SET wins regardless of
+        timestamp. The lock is per-process; across workers the epoch-ns
+        ordering check still rejects stale writes on re-read.
+        """
+        return self._payment_locks[hash(payment_id) % SHARD_COUNT]
+
+    async def get_payment(self, payment_id: str) -> Optional[Payment]:
+        raw = await self.redis.get(f"pay:{payment_id}")
+        return Payment.model_validate_json(raw) if raw else None
+
+    async def save_payment(self, payment: Payment) -> None:
+        await self.redis.set(f"pay:{payment.payment_id}", payment.model_dump_json())
+
+    async def save_payment_update(self, payment: Payment) -> None:
+        # Redis holds a serialized copy, so updates must be written back
+        await self.save_payment(payment)
+
+    async def claim_idempotency_key(self, key: str, payment_id: str) -> Optional[str]:
+        """Atomically reserve key via SETNX; return the winner's payment_id"""
+        claimed = await self.redis.set(
+            f"idem:{key}", payment_id, nx=True, ex=IDEMPOTENCY_TTL
+        )
+        if claimed:
+            return None
+        return await self.redis.get(f"idem:{key}")
+
+    async def delete_payment(self, payment_id: str) -> bool:
+        payment = await self.get_payment(payment_id)
+        if payment is None:
+            return False
+        pipe = self.redis.pipeline()
+        pipe.unlink(f"pay:{payment_id}")
+        pipe.unlink(f"idem:{payment.idempotency_key}")
+        await pipe.execute()
+        return True
+
+    async def clear(self) -> None:
+        for pattern in ("pay:*", "idem:*"):
+            async for redis_key in self.redis.scan_iter(match=pattern):
+                await self.redis.unlink(redis_key)
+
+    async def count(self) -> int:
+        total = 0
+        async for _ in self.redis.scan_iter(match="pay:*"):
+            total += 1
+        return total
+
+
+def create_store():
+    """Pick the storage backend: Redis when REDIS_URL is set, dicts otherwise"""
+    url = os.getenv("REDIS_URL")
+    if url:
+        return RedisPaymentStore(url)
+    return InMemoryPaymentStore()
@@ -1,4 +1,5 @@
 """Payment data factory for test data generation"""
+import itertools
 import uuid
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
@@ -6,6 +7,26 @@ from faker import Faker
 
 fake = Faker(['es_CO', 'es_MX', 'pt_BR'])
 
+# Faker calls dominate factory cost, so customers are generated once as a
+# fixed pool and cycled through instead of invoking Faker per payment
+_CUSTOMER_POOL_SIZE = 200
+_customer_pool = None
+
+
+def _next_customer() -> Dict[str, str]:
+    """Return the next precomputed customer (pool built lazily on first use)"""
+    global _customer_pool
+    if _customer_pool is None:
+        _customer_pool = itertools.cycle([
+            {
+                "email": fake.email(),
+                "name": fake.name(),
+                "document": fake.numerify(text="##########")
+            }
+            for _ in range(_CUSTOMER_POOL_SIZE)
+        ])
+    return dict(next(_customer_pool))
+
 
 class PaymentFactory:
     """Factory for generating test payment data"""
@@ -26,11 +47,7 @@ class PaymentFactory:
             "currency": currency,
             "payment_method": payment_method,
             "bank": bank,
-            "customer": {
-                "email": fake.email(),
-                "name": fake.name(),
-                "document": fake.numerify(text="##########")
-            },
+            "customer": _next_customer(),
             "redirect_url": "http://localhost:3000/return",
             "idempotency_key": idempotency_key or str(uuid.uuid4())
         }
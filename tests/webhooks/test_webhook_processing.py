@@ -3,7 +3,6 @@ Test suite for webhook processing (asynchronous tests)
 Backend Engineer 2 - 25 minutes
 """
 import pytest
-import asyncio
 from tests.fixtures.payment_factory import PaymentFactory, WebhookFactory
 
 
@@ -60,8 +59,8 @@ class TestWebhookProcessing:
         webhook = WebhookFactory.create_approved_webhook(payment_id)
         await send_webhook(webhook)
 
-        # Wait for webhook processing
-        await asyncio.sleep(1)
+        # Wait for webhook processing (smart polling, not sleep)
+        await wait_for_status(payment_id, "approved", timeout=5)
 
         # Customer returns and checks status
         status_response = await api_client.get(f"/payments/{payment_id}")
@@ -72,7 +71,7 @@ class TestWebhookProcessing:
         assert payment["status"] == "approved"
 
     async def test_customer_returns_before_webhook(
-        self, api_client, send_webhook, unique_idempotency_key
+        self, api_client, send_webhook, wait_for_status, unique_idempotency_key
     ):
         """
         Test 8: Race condition - customer returns before webhook
@@ -94,15 +93,12 @@ class TestWebhookProcessing:
         payment = status_response.json()
         assert payment["status"] == "pending"
 
-        # Webhook arrives 2 seconds later
-        await asyncio.sleep(2)
+        # Webhook arrives after the customer already returned
         webhook = WebhookFactory.create_approved_webhook(payment_id)
         await send_webhook(webhook)
 
-        # Assert: Status eventually updates
-        await asyncio.sleep(1)
-        final_response = await api_client.get(f"/payments/{payment_id}")
-        final_payment = final_response.json()
+        # Assert: Status eventually updates (smart polling, not sleep)
+        final_payment = await wait_for_status(payment_id, "approved", timeout=5)
         assert final_payment["status"] == "approved"
 
     async def test_duplicate_webhook_idempotency(
@@ -143,7 +139,7 @@ class TestWebhookProcessing:
         assert payment["webhook_count"] == 1  # Not 3!
 
     async def test_out_of_order_webhooks(
-        self, api_client, send_webhook, unique_idempotency_key
+        self, api_client, send_webhook, wait_for_status, unique_idempotency_key
     ):
         """
         Test 10: Expired webhook arrives after approved webhook
@@ -160,7 +156,7 @@ class TestWebhookProcessing:
         # Act: Send approved webhook (timestamp: now)
         approved_webhook = WebhookFactory.create_approved_webhook(payment_id)
         await send_webhook(approved_webhook)
-        await asyncio.sleep(1)
+        await wait_for_status(payment_id, "approved", timeout=5)
 
         # Send expired webhook with OLDER timestamp
         expired_webhook = WebhookFactory.create_old_webhook(